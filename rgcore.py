@@ -0,0 +1,2233 @@
+# -*- coding: UTF-8 -*-
+# Python 3.6.6 x64
+# Libtcod 1.6.4 x64
+
+#    RogueGate, a 7-day Roguelike
+#    Mark Johnson and Gregory Adam Scott, 10:00 GMT 29th February 2020 - 7th March 2020
+#    Copyright (c) 2020 Mark Johnson and Gregory Adam Scott
+#
+#    This file is part of RogueGate.
+#
+#    RogueGate is free software: you can redistribute it and/or modify
+#    it under the terms of the GNU General Public License as published by
+#    the Free Software Foundation, either version 3 of the License, or
+#    (at your option) any later version.
+#
+#    RogueGate is distributed in the hope that it will be useful,
+#    but WITHOUT ANY WARRANTY; without even the implied warranty of
+#    MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the
+#    GNU General Public License for more details.
+
+#    You should have received a copy of the GNU General Public License
+#    along with RogueGate, in the form of a file named "gpl.txt".
+#    If not, see <https://www.gnu.org/licenses/>.
+
+##### Libraries #####
+import os
+import mmap						# loading saved block-floors as needed
+import struct
+import pickle						# save logs, generated world cache
+import threading					# background saving
+import atexit
+import numpy as np					# array-backed map grids
+from collections import OrderedDict
+from hashlib import sha256
+from random import Random, randint
+from math import sqrt
+from concurrent.futures import ProcessPoolExecutor	# parallel world generation
+
+
+##### Constants #####
+
+# debug flags
+FULL_LIGHT = False
+FULL_VIS = False
+DEBUG_AI_TURNS = False					# print the start and end of every AI turn
+
+NAME = 'RogueGate'					# game name
+VERSION = '0.1'						# game version
+GENERATOR_VERSION = 7					# increase whenever generation from a seed, or the
+							#   stored form of a generated world, changes
+WORLD_CACHE_DIR = 'worldcache'				# directory for generated worlds by seed
+SAVE_FILE = 'savegame.sav'				# full save of the game in progress
+SAVE_FORMAT_VERSION = 2					# increase whenever the layout of a full save changes
+SAVE_HEADER = struct.Struct('<4sHHqI')			# save marker, format and generator versions, world
+							#   seed, length of the game state
+SAVE_LOG_FILE = 'savegame.log'				# changes to the game since the full save
+SAVE_SNAPSHOT_INTERVAL = 100				# changes to log before the next full save
+SAVE_JOURNAL = False					# log the actions taken instead of their changes, to
+							#   be replayed from the seed and last full save
+JOURNAL_CHECKPOINT_INTERVAL = 500			# actions to log before the next full save
+MAP_WIDTH, MAP_HEIGHT = 61, 38				# size of one block-floor map
+
+# number of worker processes to generate the whole complex up front; 0 generates each
+# block-floor when first needed instead. Only use from a script whose entry point is
+# guarded by __name__ == '__main__'
+GENERATION_WORKERS = 0
+
+
+##### Map Cell Type Definitions #####
+CELL_NULL = 0						# not active, no interactions possible
+CELL_TILE = 1						# generic linoleum tile flooring
+CELL_WALL = 2						# solid concrete wall
+CELL_STAIRS = 3						# stairway
+CELL_LINK = 4						# represents a link to another block
+
+CELL_MARKER = 100					# a marker of some kind, used for debugging
+
+ENTITY_NONE = 0						# kinds of entity
+ENTITY_LIGHT = 1
+ENTITY_PLAYER = 2
+ENTITY_BURGLAR = 3
+ENTITY_DOOR = 4
+ENTITY_DESK = 5
+ENTITY_CABINET = 6
+ENTITY_CHAIR = 7
+
+OBJECT_KINDS = {					# kind of each office object
+	'Wooden Desk': ENTITY_DESK,
+	'Cabinet': ENTITY_CABINET,
+	'Chair': ENTITY_CHAIR
+}
+
+FLAG_PLAYER = 1						# entity flags, packed into one value for
+FLAG_BURGLAR = 2					#   entity columns
+FLAG_HUMAN = 4
+FLAG_DOOR = 8
+FLAG_OPEN = 16
+FLAG_OPENS_UP = 32
+
+ACTION_MOVE = 1						# actions taken through Game.DoAction
+ACTION_STAIRS = 2
+ACTION_OPEN_DOOR = 3
+ACTION_LINK = 4
+ACTION_AI_TURN = 5
+ACTION_MESSAGE = 6
+ACTION_START_SHIFT = 7
+ACTION_CHECKPOINT = 8					# starts the journal after a full save
+
+ACTION_RECORDS = {					# arguments of each action in the journal,
+	ACTION_MOVE: struct.Struct('<bb'),		#   after its action code
+	ACTION_STAIRS: struct.Struct('<?'),
+	ACTION_OPEN_DOOR: struct.Struct(''),
+	ACTION_LINK: struct.Struct(''),
+	ACTION_AI_TURN: struct.Struct(''),
+	ACTION_MESSAGE: struct.Struct('<H'),		# length of the text that follows
+	ACTION_START_SHIFT: struct.Struct(''),
+	ACTION_CHECKPOINT: struct.Struct('<I')		# save id of the full save
+}
+
+BLOCK_LINKS = [(0,-1), (1,0), (0,1), (-1,0)]		# list of directions for links to adjacent blocks
+
+FLOOR_NAMES = ['Ground', 'Second', 'Third', 'Fourth']
+
+RUN_MAX_MOVES = 40					# most cells the player runs in one go
+
+FOV_CACHE_SIZE = 32					# visibility maps kept per block-floor
+
+RAY_STENCILS = {}					# cached ray stencils, keyed by (radius, facing)
+
+SINTABLE = [
+	0.00000, 0.01745, 0.03490, 0.05234, 0.06976, 0.08716, 0.10453,
+	0.12187, 0.13917, 0.15643, 0.17365, 0.19081, 0.20791, 0.22495, 0.24192,
+	0.25882, 0.27564, 0.29237, 0.30902, 0.32557, 0.34202, 0.35837, 0.37461,
+	0.39073, 0.40674, 0.42262, 0.43837, 0.45399, 0.46947, 0.48481, 0.50000,
+	0.51504, 0.52992, 0.54464, 0.55919, 0.57358, 0.58779, 0.60182, 0.61566,
+	0.62932, 0.64279, 0.65606, 0.66913, 0.68200, 0.69466, 0.70711, 0.71934,
+	0.73135, 0.74314, 0.75471, 0.76604, 0.77715, 0.78801, 0.79864, 0.80902,
+	0.81915, 0.82904, 0.83867, 0.84805, 0.85717, 0.86603, 0.87462, 0.88295,
+	0.89101, 0.89879, 0.90631, 0.91355, 0.92050, 0.92718, 0.93358, 0.93969,
+	0.94552, 0.95106, 0.95630, 0.96126, 0.96593, 0.97030, 0.97437, 0.97815,
+	0.98163, 0.98481, 0.98769, 0.99027, 0.99255, 0.99452, 0.99619, 0.99756,
+	0.99863, 0.99939, 0.99985, 1.00000, 0.99985, 0.99939, 0.99863, 0.99756,
+	0.99619, 0.99452, 0.99255, 0.99027, 0.98769, 0.98481, 0.98163, 0.97815,
+	0.97437, 0.97030, 0.96593, 0.96126, 0.95630, 0.95106, 0.94552, 0.93969,
+	0.93358, 0.92718, 0.92050, 0.91355, 0.90631, 0.89879, 0.89101, 0.88295,
+	0.87462, 0.86603, 0.85717, 0.84805, 0.83867, 0.82904, 0.81915, 0.80902,
+	0.79864, 0.78801, 0.77715, 0.76604, 0.75471, 0.74314, 0.73135, 0.71934,
+	0.70711, 0.69466, 0.68200, 0.66913, 0.65606, 0.64279, 0.62932, 0.61566,
+	0.60182, 0.58779, 0.57358, 0.55919, 0.54464, 0.52992, 0.51504, 0.50000,
+	0.48481, 0.46947, 0.45399, 0.43837, 0.42262, 0.40674, 0.39073, 0.37461,
+	0.35837, 0.34202, 0.32557, 0.30902, 0.29237, 0.27564, 0.25882, 0.24192,
+	0.22495, 0.20791, 0.19081, 0.17365, 0.15643, 0.13917, 0.12187, 0.10453,
+	0.08716, 0.06976, 0.05234, 0.03490, 0.01745, 0.00000, -0.01745, -0.03490,
+	-0.05234, -0.06976, -0.08716, -0.10453, -0.12187, -0.13917, -0.15643,
+	-0.17365, -0.19081, -0.20791, -0.22495, -0.24192, -0.25882, -0.27564,
+	-0.29237, -0.30902, -0.32557, -0.34202, -0.35837, -0.37461, -0.39073,
+	-0.40674, -0.42262, -0.43837, -0.45399, -0.46947, -0.48481, -0.50000,
+	-0.51504, -0.52992, -0.54464, -0.55919, -0.57358, -0.58779, -0.60182,
+	-0.61566, -0.62932, -0.64279, -0.65606, -0.66913, -0.68200, -0.69466,
+	-0.70711, -0.71934, -0.73135, -0.74314, -0.75471, -0.76604, -0.77715,
+	-0.78801, -0.79864, -0.80902, -0.81915, -0.82904, -0.83867, -0.84805,
+	-0.85717, -0.86603, -0.87462, -0.88295, -0.89101, -0.89879, -0.90631,
+	-0.91355, -0.92050, -0.92718, -0.93358, -0.93969, -0.94552, -0.95106,
+	-0.95630, -0.96126, -0.96593, -0.97030, -0.97437, -0.97815, -0.98163,
+	-0.98481, -0.98769, -0.99027, -0.99255, -0.99452, -0.99619, -0.99756,
+	-0.99863, -0.99939, -0.99985, -1.00000, -0.99985, -0.99939, -0.99863,
+	-0.99756, -0.99619, -0.99452, -0.99255, -0.99027, -0.98769, -0.98481,
+	-0.98163, -0.97815, -0.97437, -0.97030, -0.96593, -0.96126, -0.95630,
+	-0.95106, -0.94552, -0.93969, -0.93358, -0.92718, -0.92050, -0.91355,
+	-0.90631, -0.89879, -0.89101, -0.88295, -0.87462, -0.86603, -0.85717,
+	-0.84805, -0.83867, -0.82904, -0.81915, -0.80902, -0.79864, -0.78801,
+	-0.77715, -0.76604, -0.75471, -0.74314, -0.73135, -0.71934, -0.70711,
+	-0.69466, -0.68200, -0.66913, -0.65606, -0.64279, -0.62932, -0.61566,
+	-0.60182, -0.58779, -0.57358, -0.55919, -0.54464, -0.52992, -0.51504,
+	-0.50000, -0.48481, -0.46947, -0.45399, -0.43837, -0.42262, -0.40674,
+	-0.39073, -0.37461, -0.35837, -0.34202, -0.32557, -0.30902, -0.29237,
+	-0.27564, -0.25882, -0.24192, -0.22495, -0.20791, -0.19081, -0.17365,
+	-0.15643, -0.13917, -0.12187, -0.10453, -0.08716, -0.06976, -0.05234,
+	-0.03490, -0.01745, -0.00000
+]
+ 
+COSTABLE = [
+	1.00000, 0.99985, 0.99939, 0.99863, 0.99756, 0.99619, 0.99452,
+	0.99255, 0.99027, 0.98769, 0.98481, 0.98163, 0.97815, 0.97437, 0.97030,
+	0.96593, 0.96126, 0.95630, 0.95106, 0.94552, 0.93969, 0.93358, 0.92718,
+	0.92050, 0.91355, 0.90631, 0.89879, 0.89101, 0.88295, 0.87462, 0.86603,
+	0.85717, 0.84805, 0.83867, 0.82904, 0.81915, 0.80902, 0.79864, 0.78801,
+	0.77715, 0.76604, 0.75471, 0.74314, 0.73135, 0.71934, 0.70711, 0.69466,
+	0.68200, 0.66913, 0.65606, 0.64279, 0.62932, 0.61566, 0.60182, 0.58779,
+	0.57358, 0.55919, 0.54464, 0.52992, 0.51504, 0.50000, 0.48481, 0.46947,
+	0.45399, 0.43837, 0.42262, 0.40674, 0.39073, 0.37461, 0.35837, 0.34202,
+	0.32557, 0.30902, 0.29237, 0.27564, 0.25882, 0.24192, 0.22495, 0.20791,
+	0.19081, 0.17365, 0.15643, 0.13917, 0.12187, 0.10453, 0.08716, 0.06976,
+	0.05234, 0.03490, 0.01745, 0.00000, -0.01745, -0.03490, -0.05234, -0.06976,
+	-0.08716, -0.10453, -0.12187, -0.13917, -0.15643, -0.17365, -0.19081,
+	-0.20791, -0.22495, -0.24192, -0.25882, -0.27564, -0.29237, -0.30902,
+	-0.32557, -0.34202, -0.35837, -0.37461, -0.39073, -0.40674, -0.42262,
+	-0.43837, -0.45399, -0.46947, -0.48481, -0.50000, -0.51504, -0.52992,
+	-0.54464, -0.55919, -0.57358, -0.58779, -0.60182, -0.61566, -0.62932,
+	-0.64279, -0.65606, -0.66913, -0.68200, -0.69466, -0.70711, -0.71934,
+	-0.73135, -0.74314, -0.75471, -0.76604, -0.77715, -0.78801, -0.79864,
+	-0.80902, -0.81915, -0.82904, -0.83867, -0.84805, -0.85717, -0.86603, 
+	-0.87462, -0.88295, -0.89101, -0.89879, -0.90631, -0.91355, -0.92050,
+	-0.92718, -0.93358, -0.93969, -0.94552, -0.95106, -0.95630, -0.96126,
+	-0.96593, -0.97030, -0.97437, -0.97815, -0.98163, -0.98481, -0.98769,
+	-0.99027, -0.99255, -0.99452, -0.99619, -0.99756, -0.99863, -0.99939,
+	-0.99985, -1.00000, -0.99985, -0.99939, -0.99863, -0.99756, -0.99619,
+	-0.99452, -0.99255, -0.99027, -0.98769, -0.98481, -0.98163, -0.97815,
+	-0.97437, -0.97030, -0.96593, -0.96126, -0.95630, -0.95106, -0.94552,
+	-0.93969, -0.93358, -0.92718, -0.92050, -0.91355, -0.90631, -0.89879,
+	-0.89101, -0.88295, -0.87462, -0.86603, -0.85717, -0.84805, -0.83867,
+	-0.82904, -0.81915, -0.80902, -0.79864, -0.78801, -0.77715, -0.76604,
+	-0.75471, -0.74314, -0.73135, -0.71934, -0.70711, -0.69466, -0.68200,
+	-0.66913, -0.65606, -0.64279, -0.62932, -0.61566, -0.60182, -0.58779,
+	-0.57358, -0.55919, -0.54464, -0.52992, -0.51504, -0.50000, -0.48481,
+	-0.46947, -0.45399, -0.43837, -0.42262, -0.40674, -0.39073, -0.37461,
+	-0.35837, -0.34202, -0.32557, -0.30902, -0.29237, -0.27564, -0.25882,
+	-0.24192, -0.22495, -0.20791, -0.19081, -0.17365, -0.15643, -0.13917,
+	-0.12187, -0.10453, -0.08716, -0.06976, -0.05234, -0.03490, -0.01745,
+	-0.00000, 0.01745, 0.03490, 0.05234, 0.06976, 0.08716, 0.10453, 0.12187,
+	0.13917, 0.15643, 0.17365, 0.19081, 0.20791, 0.22495, 0.24192, 0.25882,
+	0.27564, 0.29237, 0.30902, 0.32557, 0.34202, 0.35837, 0.37461, 0.39073,
+	0.40674, 0.42262, 0.43837, 0.45399, 0.46947, 0.48481, 0.50000, 0.51504,
+	0.52992, 0.54464, 0.55919, 0.57358, 0.58779, 0.60182, 0.61566, 0.62932,
+	0.64279, 0.65606, 0.66913, 0.68200, 0.69466, 0.70711, 0.71934, 0.73135,
+	0.74314, 0.75471, 0.76604, 0.77715, 0.78801, 0.79864, 0.80902, 0.81915,
+	0.82904, 0.83867, 0.84805, 0.85717, 0.86603, 0.87462, 0.88295, 0.89101,
+	0.89879, 0.90631, 0.91355, 0.92050, 0.92718, 0.93358, 0.93969, 0.94552,
+	0.95106, 0.95630, 0.96126, 0.96593, 0.97030, 0.97437, 0.97815, 0.98163,
+	0.98481, 0.98769, 0.99027, 0.99255, 0.99452, 0.99619, 0.99756, 0.99863,
+	0.99939, 0.99985, 1.00000
+]
+
+
+##### Room Object - represents one room within a blockfloor
+class Room():
+	def __init__(self, blockfloor, x, y, w, h):
+		self.blockfloor = blockfloor
+		self.x = x
+		self.y = y
+		self.w = w
+		self.h = h
+		self.number = 0
+
+
+
+##### BlockLayout Object - the structural layer shared by all floors of one block #####
+# holds the cell map, rooms, door locations, lights and stairways, which are identical
+# on every floor; block-floors use its maps directly until they need to change them
+class BlockLayout():
+	def __init__(self, layout_seed, outdoor=False):
+		
+		self.outdoor = outdoor			# layout of an outdoor area
+		self.layout_seed = layout_seed		# seed for the map layout
+		self.generated = False			# full map has been generated
+		
+		self.char_map = None			# map of cells
+		self.center_point = (0,0)
+		self.hallways = None			# hallway layout in (hx1,hy1,hw,vx1,vy1,vh) format
+		self.stairways = []			# stairways in (x,y,horizontal_shift) format
+		self.room_rects = []			# list of rooms in (x,y,w,h) format
+		self.door_locations = []		# list of door cells
+		self.lights = []			# list of static light entities
+		
+		self.blocking_map = None		# light/sight blocking map with all doors closed
+		self.linked_maps = {}			# cell maps with link cells added, by link cells
+		self.static_light_map = None		# light map of static lights alone, if needed
+		
+		# roll the hallway layout now, the rest is left until Generate()
+		if self.outdoor:
+			self.center_point = (30, 19)
+		else:
+			self.RollHallways()
+	
+	
+	# generate the map, doors, lights and stairways for this layout if not done yet
+	def Generate(self):
+		if self.generated: return
+		self.char_map = NewGrid(CELL_NULL)
+		self.GenerateMap()
+		self.GenerateStairs()
+		self.blocking_map = NewGrid(False, dtype=bool)
+		for location in self.door_locations:
+			self.blocking_map[location] = True
+		self.FreezeMaps()
+		self.generated = True
+	
+	
+	# make the shared maps read-only, so that floors copy them before any change
+	def FreezeMaps(self):
+		for grid in ([self.char_map, self.blocking_map, self.static_light_map] +
+				list(self.linked_maps.values())):
+			if grid is None: continue
+			grid.flags.writeable = False
+	
+	
+	# maps are unpickled as writeable, so freeze them again after loading a game
+	def __setstate__(self, state):
+		self.__dict__.update(state)
+		self.FreezeMaps()
+	
+	
+	# get the cell map with links at the given cells, shared by all floors with the
+	# same set of links
+	def GetLinkedMap(self, link_cells):
+		link_cells = tuple(sorted(link_cells))
+		if link_cells not in self.linked_maps:
+			char_map = self.char_map.copy(order='F')
+			for (x, y) in link_cells:
+				char_map[x,y] = CELL_LINK
+			self.linked_maps[link_cells] = char_map
+			self.FreezeMaps()
+		return self.linked_maps[link_cells]
+	
+	
+	# get the light map of the static lights alone with all doors closed, calculated
+	# once and shared by every floor using this layout
+	def GetStaticLightMap(self):
+		if self.static_light_map is None:
+			self.static_light_map = NewGrid(25)
+			for entity in self.lights:
+				(x, y) = entity.location
+				Raycast(self.static_light_map, self.char_map, self.blocking_map,
+					x, y, entity.light_radius)
+			self.FreezeMaps()
+		return self.static_light_map
+	
+	
+	# add a light entity at the given location
+	def AddLight(self, x, y, light_radius):
+		new_entity = Entity(ENTITY_LIGHT)
+		new_entity.location = (x, y)
+		new_entity.light_radius = light_radius
+		self.lights.append(new_entity)
+	
+	
+	# set a given cell to a cell type, ignores if not on map
+	def SetCell(self, x, y, new_type, skip_replace, skip_floors):
+		if not OnMap(x, y): return
+		if skip_floors and self.char_map[x,y] == CELL_TILE: return
+		if skip_replace and self.char_map[x,y] != CELL_NULL: return
+		self.char_map[x,y] = new_type
+	
+	
+	# set a rectangle of cells to a cell type, clipped to the map
+	def SetRect(self, x1, y1, w, h, new_type, skip_replace, skip_floors):
+		x2, y2 = min(x1+w, MAP_WIDTH), min(y1+h, MAP_HEIGHT)
+		x1, y1 = max(x1, 0), max(y1, 0)
+		if x1 >= x2 or y1 >= y2: return
+		region = self.char_map[x1:x2, y1:y2]
+		mask = np.ones(region.shape, dtype=bool)
+		if skip_floors: mask &= region != CELL_TILE
+		if skip_replace: mask &= region == CELL_NULL
+		region[mask] = new_type
+	
+	
+	# get the cell code of the given cell; if not on map, will return CELL_NULL
+	def GetCell(self, x, y):
+		if not OnMap(x, y): return CELL_NULL
+		return self.char_map[x,y]
+	
+	
+	# roll the hallway layout from the layout seed, and return
+	# the random stream to use for the rest of the layout
+	def RollHallways(self):
+		rng = Random(self.layout_seed)
+		hx1 = rng.randint(8, 10)
+		hy1 = rng.randint(8, 27)
+		hw = rng.randint(43, 49) - hx1
+		vx1 = rng.randint(22, 40)
+		vy1 = rng.randint(4, 6)
+		vh = rng.randint(30, 36) - vy1
+		self.hallways = (hx1, hy1, hw, vx1, vy1, vh)
+		self.center_point = (vx1+1, hy1+1)
+		return rng
+	
+	
+	# generate the map for this layout, 61x38
+	def GenerateMap(self):
+		
+		# summed-area table of occupied (non-null) cells: occupancy[x,y] holds
+		# the number of occupied cells in the rectangle [0,x) by [0,y)
+		occupancy = np.zeros((MAP_WIDTH+1, MAP_HEIGHT+1), dtype=np.int32)
+		
+		# rebuild the part of the table that depends on cells at or beyond x1,y1;
+		# everything above and to the left stays valid
+		def UpdateOccupancy(x1, y1):
+			x1, y1 = max(x1, 0), max(y1, 0)
+			if x1 >= MAP_WIDTH or y1 >= MAP_HEIGHT: return
+			counts = (self.char_map[x1:, y1:] != CELL_NULL).cumsum(0).cumsum(1)
+			occupancy[x1+1:, y1+1:] = (counts + occupancy[x1, y1+1:][np.newaxis,:] +
+				occupancy[x1+1:, y1][:,np.newaxis] - occupancy[x1, y1])
+		
+		# returns True if every on-map cell in the rectangle is null
+		def RectClear(x1, y1, w, h):
+			x2, y2 = min(x1+w, MAP_WIDTH), min(y1+h, MAP_HEIGHT)
+			x1, y1 = max(x1, 0), max(y1, 0)
+			if x1 >= x2 or y1 >= y2: return True
+			return (occupancy[x2,y2] - occupancy[x1,y2] - occupancy[x2,y1] +
+				occupancy[x1,y1]) == 0
+		
+		# create a room: h, w is the floor space, with one extra layer of walls
+		def AddRoom(x1, y1, w, h, skip_replace=False, skip_floors=False, numbered=False):
+			self.SetRect(x1, y1, w, h, CELL_TILE, skip_replace, skip_floors)
+			# horizontal walls
+			self.SetRect(x1, y1-1, w, 1, CELL_WALL, skip_replace, skip_floors)
+			self.SetRect(x1, y1+h, w, 1, CELL_WALL, skip_replace, skip_floors)
+			# vertical walls
+			self.SetRect(x1-1, y1-1, 1, h+2, CELL_WALL, skip_replace, skip_floors)
+			self.SetRect(x1+w, y1-1, 1, h+2, CELL_WALL, skip_replace, skip_floors)
+			UpdateOccupancy(x1-1, y1-1)
+			
+			# record the room if it's numbered
+			if not numbered: return
+			self.room_rects.append((x1, y1, w, h))
+			
+		
+		# character map - one for each possible map cell
+		# set all cells to null to start
+		self.char_map[:] = CELL_NULL
+		
+		# outdoor blocks are set up differently
+		if self.outdoor:
+			self.char_map[:] = CELL_TILE
+			for x in range(10, 51, 10):
+				self.AddLight(x, 20, 5)
+			for y in range(10, 31, 10):
+				if y == 20: continue
+				self.AddLight(30, y, 5)
+			return
+		
+		# continue the random stream used to roll the hallways
+		rng = self.RollHallways()
+		(hx1, hy1, hw, vx1, vy1, vh) = self.hallways
+		
+		# set a main horizontal hallway to start
+		AddRoom(hx1, hy1, hw, 3)
+		
+		# set up a vertical hallway
+		AddRoom(vx1, vy1, 3, vh, skip_floors=True)
+		
+		# add a light at the center point
+		self.AddLight(vx1+1, hy1+1, 5)
+		
+		# add lights down each hallway
+		for x in range(vx1+1, hx1, -15):
+			self.AddLight(x, hy1+1, 5)
+		for x in range(vx1+1, hx1+hw, 15):
+			self.AddLight(x, hy1+1, 5)
+		
+		
+		# determine the height of the rooms off the horizontal hallway
+		room_height_upper = rng.randint(2, 6) + rng.randint(2, 6)
+		room_height_lower = rng.randint(2, 6) + rng.randint(2, 6)
+		
+		# adjust in case they would go off the map
+		if hy1-1-room_height_upper <= 0:
+			room_height_upper = hy1-2
+		if hy1+2+room_height_lower >= 35:
+			room_height_lower = 35-hy1-2
+		
+		# run across the x axis and try to add upper rooms
+		x = hx1
+		while x < hx1+hw:
+			
+			if x >= 60: break
+			
+			width = rng.randint(2, 4) + rng.randint(2, 4)
+			
+			# check for blocking walls
+			room_clear = (x+width <= 60 and
+				RectClear(x, hy1-room_height_upper, width, room_height_upper-1))
+			
+			# if not enough space
+			if not room_clear:
+				x+=1
+				continue
+			
+			# create the room
+			AddRoom(x, hy1-room_height_upper-1, width, room_height_upper, skip_replace=True, numbered=True)
+			
+			x += width+1
+		
+		# run across the x axis and try to add lower rooms
+		x = hx1
+		while x < hx1+hw:
+			
+			if x >= 60: break
+			
+			width = rng.randint(2, 4) + rng.randint(2, 4)
+			
+			# check for blocking walls
+			room_clear = (x+width <= 60 and
+				RectClear(x, hy1+4, width, room_height_lower-1))
+			
+			# if not enough space, try to adjust the room width
+			if not room_clear:
+				x+=1
+				continue
+			
+			# create the room
+			AddRoom(x, hy1+4, width, room_height_lower, skip_replace=True, numbered=True)
+			x += width+1
+
+		
+		# TODO: do the same for the vertical hallway?
+		
+		
+		# create doors to connect rooms to at least one hallway, keeping
+		# hallway ends clear for links
+		hallway_ends = list(self.GetHallwayEnds().values())
+		for (rx, ry, rw, rh) in self.room_rects:
+			possible_door_cells = []
+			
+			# check upper wall
+			for x1 in range(rx, rx+rw):
+				if self.GetCell(x1-1, ry-1) != CELL_WALL: continue
+				if self.GetCell(x1+1, ry-1) != CELL_WALL: continue
+				if (x1, ry-1) in hallway_ends: continue
+				if self.GetCell(x1,ry-2) == CELL_TILE:
+					possible_door_cells.append((x1, ry-1))
+				
+			# check lower wall
+			for x1 in range(rx, rx+rw):
+				if self.GetCell(x1-1, ry+rh) != CELL_WALL: continue
+				if self.GetCell(x1+1, ry+rh) != CELL_WALL: continue
+				if (x1, ry+rh) in hallway_ends: continue
+				if self.GetCell(x1,ry+rh+1) == CELL_TILE:
+					possible_door_cells.append((x1, ry+rh))
+		
+			if len(possible_door_cells) == 0:
+				continue
+			
+			# record a door here; each floor creates its own door entity
+			(x, y) = rng.choice(possible_door_cells)
+			self.SetCell(x, y, CELL_TILE, False, False)
+			self.door_locations.append((x,y))
+	
+	
+	# get the end cell of the hallways from the center point in each link direction:
+	# the end wall of the hallway, or the map edge if outdoors
+	def GetHallwayEnds(self):
+		(x, y) = self.center_point
+		if self.outdoor:
+			return {
+				(0,-1): (x, 0),
+				(1,0): (MAP_WIDTH-1, y),
+				(0,1): (x, MAP_HEIGHT-1),
+				(-1,0): (0, y)
+			}
+		(hx1, hy1, hw, vx1, vy1, vh) = self.hallways
+		return {
+			(0,-1): (x, vy1-1),
+			(1,0): (hx1+hw, y),
+			(0,1): (x, vy1+vh),
+			(-1,0): (hx1-1, y)
+		}
+	
+	
+	# generate stairway cells for this layout, each with a wall on its outer side
+	def GenerateStairs(self):
+		for (x, y, horizontal_shift) in self.stairways:
+			self.SetCell(x, y, CELL_STAIRS, False, False)
+			if horizontal_shift < 0:
+				x1 = x-1
+			else:
+				x1 = x+1
+			for y1 in range(y-1,y+2):
+				self.SetCell(x1, y1, CELL_WALL, False, False)
+
+
+
+##### BlockFloor Object - represents one floor of one block of the entire complex #####
+# created as a lightweight stub around the layout of its block; the layout, rooms,
+# doors and objects are generated the first time the floor is used. Maps are shared
+# with the layout, and only copied for a floor when it changes them
+class BlockFloor():
+	def __init__(self, x, y, floor, layout, object_seed):
+		
+		self.x = x
+		self.y = y
+		self.floor = floor
+		self.layout = layout			# structural layout, shared by all floors of block
+		self.outdoor = layout.outdoor		# block is only the ground floor of an outdoor area
+		self.letter = ''			# block letter, A-
+		self.generated = False			# full map has been generated
+		self.object_seed = object_seed		# seed for objects on this floor
+		self.saved_section = None		# saved state of this floor from a full save, to
+							#   apply when it is generated
+		
+		self.links = {				# links to adjacent blocks
+			(0,-1): None,
+			(1,0): None,
+			(0,1): None,
+			(-1,0): None
+		}
+		
+		self.link_locations = {			# cell locations of links to other blocks
+			(0,-1): None,
+			(1,0): None,
+			(0,1): None,
+			(-1,0): None
+		}
+		
+		self.vertical_links = {			# links to adjacent floors in same block
+			-1: None,
+			1: None
+		}
+		
+		self.char_map = None			# map of cells
+		self.center_point = layout.center_point
+		self.rooms = []				# list of rooms in (x,y,w,h) format
+		self.entities = []			# list of entities in the map
+		self.entity_map = {}			# lists of entities in the map, keyed by cell
+		self.entity_columns = None		# entities as arrays, see GetEntityColumns
+		
+		self.changed_doors = set()		# locations of doors changed since the last save
+		self.moved_entities = set()		# entities moved since the last save
+		self.entities_changed = False		# entities added or removed since the last save
+		
+		self.blocking_entity_map = None		# map of cells where light/sight blocked by entities
+		self.light_map = None			# light values for cells
+		self.static_light_map = None		# cached light values from static lights alone
+		self.static_light_layers = {}		# cached light values of each static light
+		self.opacity_map = None			# flattened opacity of cells, for shadowcasting
+		self.opacity_version = 0		# increased whenever opacity_map changes
+		self.fov_results = OrderedDict()	# recent visibility maps, keyed by location and
+							#   opacity version
+		self.observer_results = {}		# last visibility map of each AI observer
+		self.owned_maps = set()			# names of maps copied from the shared layout
+	
+	
+	# generate the rooms, doors and objects for this block-floor if not done yet
+	def Generate(self):
+		if self.generated: return
+		self.layout.Generate()
+		
+		# generation is repeated when a saved game is loaded, so the entities it
+		# adds don't need saving
+		entities_changed = self.entities_changed
+		
+		for (x, y, w, h) in self.layout.room_rects:
+			self.rooms.append(Room(self, x, y, w, h))
+		self.SetRoomNumbers()
+		
+		# static lights are shared with the layout, doors belong to this floor
+		for entity in self.layout.lights:
+			self.AddEntity(entity)
+		for location in self.layout.door_locations:
+			new_entity = Entity(ENTITY_DOOR)
+			new_entity.block = self
+			new_entity.location = location
+			new_entity.is_door = True
+			self.AddEntity(new_entity)
+		
+		self.GenerateLinks()
+		self.blocking_entity_map = self.layout.blocking_map
+		self.light_map = NewGrid(0)
+		self.owned_maps.add('light_map')
+		self.GenerateObjects()
+		self.entities_changed = entities_changed
+		self.generated = True
+		
+		if self.saved_section is not None:
+			self.LoadSection(self.saved_section)
+	
+	
+	# make sure this floor has its own copy of the given map before changing it
+	def OwnMap(self, name):
+		if name in self.owned_maps: return
+		setattr(self, name, getattr(self, name).copy(order='F'))
+		self.owned_maps.add(name)
+	
+	
+	# cached light and visibility results are not saved, they are rebuilt as needed
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state['static_light_map'] = None
+		state['static_light_layers'] = {}
+		state['opacity_map'] = None
+		state['fov_results'] = OrderedDict()
+		state['observer_results'] = {}
+		state['entity_columns'] = None
+		if self.saved_section is not None:
+			state['saved_section'] = bytes(self.saved_section)
+		return state
+	
+	
+	# get the state of this floor for a full save: the cell map as bytes, the
+	# blocking map as a bitset, then the entities as columns
+	def SaveSection(self):
+		(xs, ys, kinds, flags, light_radii) = self.GetEntityColumns()
+		return b''.join([
+			self.char_map.tobytes(order='F'),
+			PackGrid(self.blocking_entity_map).tobytes(),
+			struct.pack('<I', len(self.entities)),
+			kinds.tobytes(),
+			xs.astype('<i2').tobytes(),
+			ys.astype('<i2').tobytes(),
+			flags.tobytes(),
+			light_radii.astype(np.uint8).tobytes()
+		])
+	
+	
+	# restore the state of this floor from SaveSection, once it has been
+	# generated; entities that generation would have added are kept, so they
+	# stay shared with the layout and the game. They are matched to the saved
+	# ones by kind and by order within their kind, which does not depend on the
+	# order in which the kinds were added
+	def LoadSection(self, section):
+		self.saved_section = None
+		
+		cells = MAP_WIDTH * MAP_HEIGHT
+		char_map = np.frombuffer(section, np.uint8, cells).reshape(
+			(MAP_WIDTH, MAP_HEIGHT), order='F')
+		if not np.array_equal(char_map, self.char_map):
+			self.OwnMap('char_map')
+			self.char_map[:] = char_map
+		offset = cells
+		
+		packed_size = (cells + 7) // 8
+		blocking_map = UnpackGrid(np.frombuffer(section, np.uint8, packed_size, offset))
+		offset += packed_size
+		
+		(count,) = struct.unpack_from('<I', section, offset)
+		offset += 4
+		columns = []
+		for dtype in (np.uint8, '<i2', '<i2', np.uint8, np.uint8):
+			column = np.frombuffer(section, dtype, count, offset)
+			offset += column.nbytes
+			columns.append(column.tolist())
+		
+		generated = {}
+		for entity in self.entities:
+			generated.setdefault(entity.kind, []).append(entity)
+		
+		object_names = {kind: name for (name, kind) in OBJECT_KINDS.items()}
+		entities = []
+		for (kind, x, y, flags, light_radius) in zip(*columns):
+			if len(generated.get(kind, [])) > 0:
+				entity = generated[kind].pop(0)
+			else:
+				entity = Entity(kind)
+				entity.block = self
+				entity.object_name = object_names.get(kind)
+			entity.location = (x, y)
+			entity.light_radius = light_radius
+			entity.is_player = bool(flags & FLAG_PLAYER)
+			entity.is_burglar = bool(flags & FLAG_BURGLAR)
+			entity.is_human = bool(flags & FLAG_HUMAN)
+			entity.is_door = bool(flags & FLAG_DOOR)
+			entity.open_state = bool(flags & FLAG_OPEN)
+			entity.opens_up = bool(flags & FLAG_OPENS_UP)
+			entities.append(entity)
+		
+		self.entities = []
+		self.entity_map = {}
+		for entity in entities:
+			self.AddEntity(entity)
+		self.ClearChanges()
+		
+		# the saved map only differs from the generated one if doors were opened
+		if not np.array_equal(blocking_map, self.blocking_entity_map):
+			self.GenerateSightBlockMap()
+	
+	
+	# add an entity to this floor at its current location
+	def AddEntity(self, entity):
+		self.entities.append(entity)
+		self.entity_map.setdefault(entity.location, []).append(entity)
+		self.entity_columns = None
+		self.entities_changed = True
+	
+	
+	# remove an entity from this floor
+	def RemoveEntity(self, entity):
+		self.entity_columns = None
+		self.entities_changed = True
+		self.entities.remove(entity)
+		self.entity_map[entity.location].remove(entity)
+		if len(self.entity_map[entity.location]) == 0:
+			del self.entity_map[entity.location]
+	
+	
+	# move an entity on this floor to a new location
+	def MoveEntity(self, entity, location):
+		self.entity_map[entity.location].remove(entity)
+		if len(self.entity_map[entity.location]) == 0:
+			del self.entity_map[entity.location]
+		entity.location = location
+		self.entity_map.setdefault(location, []).append(entity)
+		self.entity_columns = None
+		self.moved_entities.add(entity)
+	
+	
+	# get the entities in the given cell
+	def GetEntitiesAt(self, location):
+		return self.entity_map.get(location, [])
+	
+	
+	# get the door in the given cell, if any
+	def GetDoorAt(self, location):
+		for entity in self.GetEntitiesAt(location):
+			if entity.is_door: return entity
+		return None
+	
+	
+	# forget the changes made since the last save, once they have been saved
+	def ClearChanges(self):
+		self.changed_doors = set()
+		self.moved_entities = set()
+		self.entities_changed = False
+	
+	
+	# get the entities on this floor as arrays in the same order as entities: x
+	# and y locations, kinds, flags and light radii; kept until an entity is
+	# added, removed or moved or a door changes state
+	def GetEntityColumns(self):
+		if self.entity_columns is None:
+			self.entity_columns = (
+				np.array([entity.location[0] for entity in self.entities], dtype=np.int32),
+				np.array([entity.location[1] for entity in self.entities], dtype=np.int32),
+				np.array([entity.kind for entity in self.entities], dtype=np.uint8),
+				np.array([entity.GetFlags() for entity in self.entities], dtype=np.uint8),
+				np.array([entity.light_radius for entity in self.entities], dtype=np.int32))
+		return self.entity_columns
+	
+	
+	# set a given cell to a cell type, ignores if not on map
+	def SetCell(self, x, y, new_type, skip_replace, skip_floors):
+		if not OnMap(x, y): return
+		if skip_floors and self.char_map[x,y] == CELL_TILE: return
+		if skip_replace and self.char_map[x,y] != CELL_NULL: return
+		self.OwnMap('char_map')
+		self.char_map[x,y] = new_type
+	
+	
+	# get the cell code of the given cell; if not on map, will return CELL_NULL
+	def GetCell(self, x, y):
+		if not OnMap(x, y): return CELL_NULL
+		return self.char_map[x,y]
+	
+	
+	# generate map of light/sight blocking entities from scratch, eg. when a saved
+	# floor is restored; single doors are changed with SetDoorState instead
+	def GenerateSightBlockMap(self):
+		
+		# clear current map
+		self.OwnMap('blocking_entity_map')
+		self.blocking_entity_map[:] = False
+		
+		(xs, ys, kinds, flags, light_radii) = self.GetEntityColumns()
+		closed_doors = (flags & (FLAG_DOOR | FLAG_OPEN)) == FLAG_DOOR
+		self.blocking_entity_map[xs[closed_doors], ys[closed_doors]] = True
+		
+		# static lights and sight may now reach different cells
+		self.static_light_map = None
+		self.static_light_layers = {}
+		self.opacity_map = None
+		self.opacity_version += 1
+		self.fov_results.clear()
+	
+	
+	# open or close a door on this floor, and throw out only the cached lights and
+	# visibility maps that could have reached the door cell
+	def SetDoorState(self, door, open_state):
+		if door.open_state == open_state: return
+		door.open_state = open_state
+		self.entity_columns = None
+		self.changed_doors.add(door.location)
+		
+		(x, y) = door.location
+		self.OwnMap('blocking_entity_map')
+		self.blocking_entity_map[x,y] = not open_state
+		if self.opacity_map is not None:
+			self.opacity_map[x + y*MAP_WIDTH] = bool(self.char_map[x,y] == CELL_WALL) or not open_state
+		self.opacity_version += 1
+		
+		for (i, entity) in enumerate(self.layout.lights):
+			if i not in self.static_light_layers: continue
+			(lx, ly) = entity.location
+			if max(abs(lx-x), abs(ly-y)) > entity.light_radius: continue
+			del self.static_light_layers[i]
+			self.static_light_map = None
+		
+		# cells beyond the door can only be seen from locations that can see the
+		# door, so the other results carry over to the new opacity version
+		fov_results = OrderedDict()
+		for ((location, version), packed) in self.fov_results.items():
+			if version != self.opacity_version-1: continue
+			if PackedGridCell(packed, x, y): continue
+			fov_results[(location, self.opacity_version)] = packed
+		self.fov_results = fov_results
+	
+	
+	# set room numbers for this blockfloor
+	def SetRoomNumbers(self):
+		room_index = 0
+		for room in self.rooms:
+			room.number = (100 * (self.floor + 1)) + room_index
+			room_index += 1
+		
+	
+	# set link locations for this block to horizontal and vertical adjacent ones
+	def SetLinkLocations(self):
+		hallway_ends = self.layout.GetHallwayEnds()
+		for (xm, ym) in BLOCK_LINKS:
+			# link in this direction
+			if self.links[(xm, ym)]:
+				self.link_locations[(xm, ym)] = hallway_ends[(xm, ym)]
+	
+	
+	# generate link cells for this block to horizontal and vertical adjacent ones,
+	# using the layout map shared by floors with the same links
+	def GenerateLinks(self):
+		link_cells = [location for location in self.link_locations.values()
+			if location is not None]
+		self.char_map = self.layout.GetLinkedMap(link_cells)
+		self.owned_maps.discard('char_map')
+	
+	
+	# generate objects for this floor
+	def GenerateObjects(self):
+		
+		OBJECTS = ['Wooden Desk', 'Cabinet', 'Chair']
+		
+		rng = Random(self.object_seed)
+		for room in self.rooms:
+			
+			for i in range(rng.randint(2, 5)):
+				x = rng.randint(room.x, room.x+room.w-1)
+				y = rng.randint(room.y, room.y+room.h-1)
+			
+				object_name = rng.choice(OBJECTS)
+				new_entity = Entity(OBJECT_KINDS[object_name])
+				new_entity.location = (x, y)
+				new_entity.object_name = object_name
+				self.AddEntity(new_entity)
+
+
+	# generate or re-generate the light map for all cells in this block-level,
+	# including the flashlight of the given entity if any
+	def GenerateLightMap(self, flashlight=None):
+		
+		# debug
+		if FULL_LIGHT:
+			self.light_map[:] = 255
+			return
+
+		# start from the static light layer, then add the flashlight on top
+		self.light_map[:] = self.GetStaticLightMap()
+		
+		# cast light from player flashlight
+		if flashlight is None: return
+		(x, y) = flashlight.location
+		Raycast(self.light_map, self.char_map, self.blocking_entity_map,
+			x, y, 14, facing=flashlight.facing)
+
+
+	# get the light map of the static lights alone for this floor, composited
+	# from the light of each static light, which is kept until a door in its
+	# reach changes state
+	def GetStaticLightMap(self):
+		if self.static_light_map is not None:
+			return self.static_light_map
+		
+		# outdoor areas have no doors, so use the static light map shared
+		# by all of them
+		if self.outdoor:
+			self.static_light_map = self.layout.GetStaticLightMap()
+			return self.static_light_map
+		
+		self.static_light_map = NewGrid(25)
+		for (i, entity) in enumerate(self.layout.lights):
+			if i not in self.static_light_layers:
+				layer = NewGrid(0)
+				(x, y) = entity.location
+				Raycast(layer, self.char_map, self.blocking_entity_map,
+					x, y, entity.light_radius)
+				self.static_light_layers[i] = layer
+			np.maximum(self.static_light_map, self.static_light_layers[i],
+				out=self.static_light_map)
+		self.static_light_map.flags.writeable = False
+		return self.static_light_map
+	
+	
+	# get the opacity of each cell, flattened in column order, for shadowcasting;
+	# walls and blocking entities (eg. closed doors) are opaque
+	def GetOpacityMap(self):
+		if self.opacity_map is None:
+			opaque = (self.char_map == CELL_WALL) | self.blocking_entity_map
+			self.opacity_map = bytearray(opaque.tobytes(order='F'))
+		return self.opacity_map
+	
+	
+	# get the visibility map from the given location on this floor; recent results
+	# are kept, keyed by location and the version of the opacity map
+	def GetVisMap(self, location):
+		key = (location, self.opacity_version)
+		if key in self.fov_results:
+			self.fov_results.move_to_end(key)
+			return UnpackGrid(self.fov_results[key])
+		
+		(x, y) = location
+		vis = ShadowCast(self.GetOpacityMap(), x, y)
+		self.fov_results[key] = PackGrid(vis)
+		if len(self.fov_results) > FOV_CACHE_SIZE:
+			self.fov_results.popitem(last=False)
+		return vis
+	
+	
+	# get the visibility maps of many observers on this floor in one pass, packed
+	# as bitsets and keyed by observer; observers that haven't moved keep their
+	# last result, and observers sharing a location share one cast
+	def GetVisMaps(self, observers):
+		
+		results = {}
+		casts = {}
+		for entity in observers:
+			key = (entity.location, self.opacity_version)
+			
+			# observer hasn't moved and no door has changed since last time
+			if entity in self.observer_results:
+				(last_key, packed) = self.observer_results[entity]
+				if last_key == key:
+					results[entity] = packed
+					continue
+			
+			if key not in casts:
+				if key in self.fov_results:
+					casts[key] = self.fov_results[key]
+				else:
+					(x, y) = entity.location
+					casts[key] = PackGrid(ShadowCast(self.GetOpacityMap(), x, y))
+			results[entity] = casts[key]
+		
+		self.observer_results = {}
+		for (entity, packed) in results.items():
+			self.observer_results[entity] = ((entity.location, self.opacity_version), packed)
+		return results
+	
+	
+	# generate the visibility map from the given location in this block, store
+	# info in vis_map
+	def GenerateVisMap(self, vis_map, location):
+		
+		# debug flag
+		if FULL_VIS:
+			vis_map[:] = True
+			return
+		
+		vis_map[:] = self.GetVisMap(location)
+	
+
+
+##### Entity Object - represents a dynamic thing in the world: the player, one of the burglars, etc.
+class Entity:
+	
+	__slots__ = ('kind', 'is_player', 'is_burglar', 'is_human', 'block', 'location',
+		'facing', 'light_radius', 'is_door', 'open_state', 'opens_up', 'object_name')
+	
+	def __init__(self, kind=ENTITY_NONE):
+		self.kind = kind		# kind of entity, fixed at creation
+		self.is_player = False
+		self.is_burglar = False
+		self.is_human = False		# human entity: burglar or staff member
+		self.block = None		# pointer to block location
+		self.location = (0,0)		# current location in the world
+		self.facing = None		# direction facing
+		self.light_radius = 0		# entity emits light to this radius
+		
+		self.is_door = False
+		self.open_state = False
+		self.opens_up = True
+		
+		self.object_name = None		# entity is an office object of some kind
+	
+	
+	# entities are saved as a plain tuple of their values, in slot order
+	def __getstate__(self):
+		return tuple(getattr(self, name) for name in self.__slots__)
+	
+	
+	def __setstate__(self, state):
+		for (name, value) in zip(self.__slots__, state):
+			setattr(self, name, value)
+	
+	
+	# get the flags of this entity packed into one value
+	def GetFlags(self):
+		flags = 0
+		if self.is_player: flags |= FLAG_PLAYER
+		if self.is_burglar: flags |= FLAG_BURGLAR
+		if self.is_human: flags |= FLAG_HUMAN
+		if self.is_door: flags |= FLAG_DOOR
+		if self.open_state: flags |= FLAG_OPEN
+		if self.opens_up: flags |= FLAG_OPENS_UP
+		return flags
+
+
+
+##### Game Object - holds everything for a given game #####
+# a game restored from a save is only set up as far as its seed goes; the save sets
+# where the player is, and generates that block-floor
+class Game:
+	def __init__(self, seed=None, workers=None, restoring=False):
+		
+		# master seed for all the random streams used by generation
+		self.seed = seed
+		if self.seed is None:
+			self.seed = randint(0, 2**31)
+		
+		self.init_finished = False
+		self.hour = 19			# current time
+		self.minute = 0	
+		self.next_day = False		# if clock has passed midnight already
+		self.msg_log = []		# list of game messages
+		
+		self.saved_messages = 0		# number of messages already saved
+		self.save_id = 0		# random id of the last full save
+		self.saved_changes = None	# number of changes saved since the last full
+						#   save, None if the next save must be full
+		self.journal_saves = False	# save log holds the journal instead of changes
+		self.journal = []		# actions taken since the last save
+		
+		# list of entities in the world
+		self.entities = []
+		
+		# building blocks within the complex, 5x3 possible locations
+		# dictionary, one list per coordinate; each block-floor starts as a stub
+		# and is generated in full when first needed
+		self.block_map = {}
+		self.layout_tries = 0		# tries needed to roll an acceptable complex layout
+		self.GenerateBlocks()
+		for x in range(5):
+			for y in range(3):
+				for block in self.block_map[(x,y)]:
+					block.SetLinkLocations()
+		# generate stairways per block with 2+ floors
+		self.GenerateStairways()
+		
+		self.active_block = None			# current block in viewport
+		self.active_floor = 0				# current floor in viewport
+		self.vis_map = NewGrid(False, dtype=bool)	# visibility for player in current block
+		
+		# create player object
+		new_entity = Entity(ENTITY_PLAYER)
+		new_entity.is_player = True
+		self.entities.append(new_entity)
+		self.player = new_entity
+		
+		# put player in block A to start and move viewport to there
+		self.MovePlayerToBlock('A')
+		if not restoring:
+			self.SetActiveBlock(self.player.block)
+		
+		# generate AI entities
+		self.SpawnAIEntities()
+		
+		# optionally generate everything up front across worker processes; done
+		# last so that entities are added to each floor in the same order as when
+		# it is generated on its own
+		if workers is None:
+			workers = GENERATION_WORKERS
+		if workers > 0 and not restoring:
+			self.GenerateInPool(workers)
+	
+	
+	# allow AI entities to act, returns True if the player was seen
+	def DoAITurn(self):
+		if DEBUG_AI_TURNS:
+			print('DEBUG: Starting AI turn')
+		
+		player_seen = False
+		
+		# work out what the AI entities can see, one batch per block-floor; a floor
+		# is generated when an AI entity first looks around it
+		observers = {}
+		for entity in self.entities:
+			if entity.is_player or not entity.is_human: continue
+			entity.block.Generate()
+			observers.setdefault(entity.block, []).append(entity)
+		
+		for (block, entities) in observers.items():
+			vis = block.GetVisMaps(entities)
+			if block is not self.active_block: continue
+			(x, y) = self.player.location
+			for entity in entities:
+				if PackedGridCell(vis[entity], x, y):
+					player_seen = True
+		
+		if DEBUG_AI_TURNS:
+			print('DEBUG: AI turn finished')
+		return player_seen
+	
+	
+	# add a game message
+	def AddMessage(self, text):
+		self.msg_log.append(text)
+	
+	
+	# finish starting a new game
+	def StartShift(self):
+		self.init_finished = True
+	
+	
+	# take an action as the player or AI and add it to the journal, so that the game
+	# can be restored by replaying its actions; returns the result of the action
+	def DoAction(self, action, *args):
+		self.journal.append(EncodeAction(action, *args))
+		return self.RunAction(action, args)
+	
+	
+	# take an action without adding it to the journal
+	def RunAction(self, action, args):
+		if action == ACTION_MOVE:
+			return self.MovePlayer(*args)
+		elif action == ACTION_STAIRS:
+			return self.PlayerTakesStairs(*args)
+		elif action == ACTION_OPEN_DOOR:
+			return self.OpenDoor()
+		elif action == ACTION_LINK:
+			return self.LinkPlayer()
+		elif action == ACTION_AI_TURN:
+			return self.DoAITurn()
+		elif action == ACTION_MESSAGE:
+			return self.AddMessage(*args)
+		elif action == ACTION_START_SHIFT:
+			return self.StartShift()
+	
+	
+	# get the state of the game apart from its block-floors, in the same form as
+	# GetChanges so that it can be restored with ApplyChanges
+	def GetState(self):
+		block = self.player.block
+		return {
+			'player': (block.x, block.y, block.floor, self.player.location,
+				self.player.facing),
+			'clock': (self.hour, self.minute, self.next_day),
+			'init_finished': self.init_finished,
+			'messages': (0, self.msg_log),
+			'doors': [],
+			'entities': []
+		}
+	
+	
+	# get the changes to the game since the last time this was called, and forget
+	# them; returns None if anything changed that can only be saved in full
+	def GetChanges(self):
+		
+		changes = self.GetState()
+		changes['messages'] = (self.saved_messages, self.msg_log[self.saved_messages:])
+		self.saved_messages = len(self.msg_log)
+		
+		full_save = False
+		for ((x, y), floors) in self.block_map.items():
+			for block in floors:
+				if block.entities_changed:
+					full_save = True
+				for location in block.changed_doors:
+					changes['doors'].append((x, y, block.floor, location,
+						block.GetDoorAt(location).open_state))
+				for entity in block.moved_entities:
+					changes['entities'].append((x, y, block.floor,
+						block.entities.index(entity), entity.location))
+				block.ClearChanges()
+		
+		if full_save: return None
+		return changes
+	
+	
+	# apply changes from GetChanges to this game, eg. when loading a saved game
+	def ApplyChanges(self, changes):
+		
+		for (x, y, floor, location, open_state) in changes['doors']:
+			block = self.block_map[(x,y)][floor]
+			block.Generate()
+			block.SetDoorState(block.GetDoorAt(location), open_state)
+		
+		for (x, y, floor, index, location) in changes['entities']:
+			block = self.block_map[(x,y)][floor]
+			block.Generate()
+			block.MoveEntity(block.entities[index], location)
+		
+		(self.hour, self.minute, self.next_day) = changes['clock']
+		self.init_finished = changes['init_finished']
+		(start, messages) = changes['messages']
+		self.msg_log[start:] = messages
+		
+		(x, y, floor, location, facing) = changes['player']
+		self.player.block = self.block_map[(x,y)][floor]
+		self.player.location = location
+		self.player.facing = facing
+		self.SetActiveBlock(self.player.block)
+	
+	
+	# derive a seed for one independent part of generation from the master seed, so
+	# that it does not depend on the order in which the parts are generated
+	def GetSeed(self, *keys):
+		return Random(' '.join(str(key) for key in (self.seed,) + keys)).getrandbits(32)
+	
+	
+	# generate every block layout in a pool of worker processes, then stitch them
+	# back into the block-floors and generate those; since every layout and floor
+	# has its own random stream, the result is the same as generating them in turn
+	def GenerateInPool(self, workers):
+		
+		layouts = []
+		for x in range(5):
+			for y in range(3):
+				layout = self.block_map[(x,y)][0].layout
+				if layout in layouts or layout.generated: continue
+				layouts.append(layout)
+		
+		with ProcessPoolExecutor(max_workers=workers) as pool:
+			generated_layouts = list(pool.map(GenerateLayout, layouts))
+		
+		# replace the stub layouts with the generated copies sent back
+		for x in range(5):
+			for y in range(3):
+				for block in self.block_map[(x,y)]:
+					if block.layout in layouts:
+						block.layout = generated_layouts[layouts.index(block.layout)]
+		self.GenerateAll()
+	
+	
+	# generate every block-floor now instead of when first needed
+	def GenerateAll(self):
+		for x in range(5):
+			for y in range(3):
+				for block in self.block_map[(x,y)]:
+					block.Generate()
+	
+	
+	# set the block-floor in the viewport, generating it first if required
+	def SetActiveBlock(self, block):
+		block.Generate()
+		self.active_block = block
+	
+	
+	# regenerate the player visibility map and the light map for the active block-floor
+	def UpdateViewMaps(self):
+		self.active_block.GenerateVisMap(self.vis_map, self.player.location)
+		self.active_block.GenerateLightMap(self.player)
+	
+	
+	# warp the player to the ground floor, center of the given block
+	def MovePlayerToBlock(self, block_letter):
+		for x in range(5):
+			for y in range(3):
+				block = self.block_map[(x,y)][0]
+				if block.letter == block_letter:
+					self.player.block = block
+					self.player.location = block.center_point
+					self.player.facing = (0,1)
+					return
+	
+	
+	# roll the layout of the complex on the abstract 5x3 grid of block locations,
+	# returns a dictionary of True for building blocks and False for outdoor
+	# areas, and the number of tries needed to get an acceptable layout
+	def RollComplexLayout(self):
+		
+		rng = Random(self.GetSeed('complex'))
+		for tries in range(300):
+			
+			# run through block locations and roll for presence of a building block
+			layout = {}
+			block_list = [(x,y) for x in range(5) for y in range(3)]
+			rng.shuffle(block_list)
+			total_blocks = 0
+			
+			for (x,y) in block_list:
+				
+				# blocks in center of complex have less chance of being spawned
+				if y == 1 and 0 < x < 4:
+					chance = 20
+				else:
+					chance = 70
+				
+				# modify by already existing number of blocks
+				chance -= total_blocks * 5
+				
+				layout[(x,y)] = rng.randint(1, 100) <= chance
+				if layout[(x,y)]:
+					total_blocks += 1
+			
+			# apply block number restrictions
+			if total_blocks <= 7 or total_blocks >= 12:
+				continue
+			
+			# make sure there are at least 3 outdoors blocks along the edge
+			outdoor_blocks = 0
+			for (x,y) in block_list:
+				# not an edge block
+				if y == 1 and 0 < x < 4: continue
+				if not layout[(x,y)]:
+					outdoor_blocks += 1
+			
+			if outdoor_blocks < 3: continue
+			
+			# layout is good!
+			break
+		
+		return (layout, tries)
+	
+	
+	# generate a series of building blocks for the complex
+	def GenerateBlocks(self):
+		
+		# decide the layout first, then create block-floors only for that layout
+		(complex_layout, self.layout_tries) = self.RollComplexLayout()
+		print('Generated map after ' + str(self.layout_tries) + ' tries')
+		
+		# all outdoor areas share a single layout
+		outdoor_layout = BlockLayout(0, outdoor=True)
+		for x in range(5):
+			for y in range(3):
+				if complex_layout[(x,y)]:
+					layout = BlockLayout(self.GetSeed('layout', x, y))
+				else:
+					layout = outdoor_layout
+				self.block_map[(x,y)] = [BlockFloor(x, y, 0, layout,
+					self.GetSeed('objects', x, y, 0))]
+		
+		# apply letters and check for upper floor generation
+		rng = Random(self.GetSeed('floors'))
+		i = 0
+		for y in range(3):
+			for x in range(5):
+				if self.block_map[(x,y)][0].outdoor: continue
+				
+				self.block_map[(x,y)][0].letter = chr(i+65)
+				
+				# possible 2nd, 3rd, and 4th floor
+				for f in range(1, 4):
+					
+					# roll to break here
+					if rng.randint(1, 100) <= f*10:
+						break
+				
+					# shares the layout of the ground floor
+					block_floor = BlockFloor(x, y, f, self.block_map[(x,y)][0].layout,
+						self.GetSeed('objects', x, y, f))
+					block_floor.letter = chr(i+65)
+					self.block_map[(x,y)].append(block_floor)
+				
+				# TODO: add stair and elevator connections here
+				if len(self.block_map[(x,y)]) > 1:
+					pass
+				
+				
+				# increase block letter
+				i += 1
+		
+		# run through each block, apply letters and check for links
+		for y in range(3):
+			for x in range(5):
+				
+				for block in self.block_map[(x,y)]:
+					
+					# link blocks to adjacent ones
+					for (xm, ym) in BLOCK_LINKS:
+						
+						if (x+xm,y+ym) not in self.block_map:
+							continue
+						
+						block_list = self.block_map[(x+xm,y+ym)]
+						
+						# adjacent floor exists, link to it
+						if len(block_list) > block.floor:
+							block.links[(xm,ym)] = block_list[block.floor]
+					
+					# link floors to vertically adjacent ones
+					if block.floor < len(self.block_map[(x,y)])-1:
+						block.vertical_links[1] = self.block_map[(x,y)][block.floor+1]
+					if block.floor > 0:
+						block.vertical_links[-1] = self.block_map[(x,y)][block.floor-1]
+	
+	
+	# generate stairway connections for all floors in a given block
+	def GenerateStairways(self):
+		
+		for x in range(5):
+			for y in range(3):
+				
+				# skip outdoor and single-level blocks
+				if len(self.block_map[(x,y)]) == 1: continue
+				
+				# working with the ground floor, find two suitable locations
+				# for stairways: one cell in from the upper and lower end of
+				# the vertical hallway
+				layout = self.block_map[(x,y)][0].layout
+				(hx1, hy1, hw, vx1, vy1, vh) = layout.hallways
+				(xc, yc) = layout.center_point
+				
+				# stamped into the layout shared by each floor
+				rng = Random(self.GetSeed('stairways', x, y))
+				horizontal_shift1 = rng.choice([-2, 2])
+				horizontal_shift2 = rng.choice([-2, 2])
+				layout.stairways = [
+					(xc+horizontal_shift1, vy1+1, horizontal_shift1),
+					(xc+horizontal_shift2, vy1+vh-2, horizontal_shift2)
+				]
+	
+	# generate AI entities: burglars and random staff
+	def SpawnAIEntities(self):
+		
+		# generate five burglars and place them at the outer edge of random outdoor blocks
+		floor_list = []
+		for x in range(5):
+			for y in range(3):
+				# not an edge block
+				if y == 1 and 0 < x < 4: continue
+				if self.block_map[(x,y)][0].outdoor:
+					floor_list.append(self.block_map[(x,y)][0])
+		
+		print('DEBUG: Identified ' + str(len(floor_list)) + ' possible entry blocks')
+		
+		rng = Random(self.GetSeed('burglars'))
+		for i in range(5):
+			new_entity = Entity(ENTITY_BURGLAR)
+			new_entity.is_burglar = True
+			new_entity.is_human = True
+			
+			block = rng.choice(floor_list)
+			new_entity.block = block
+			
+			# TODO: choose a random point in the block, check to see if another
+			# entity is already there
+			
+			new_entity.location = block.center_point
+			block.AddEntity(new_entity)
+			self.entities.append(new_entity)
+			print('DEBUG: Added a burglar in Block ' + str(block.x) + ',' + str(block.y))
+
+	
+	# player tries to open a door
+	def OpenDoor(self):
+		
+		# see if there is a door in front of player
+		(x,y) = self.player.location
+		(xm,ym) = self.player.facing
+		
+		x+=xm
+		y+=ym
+		
+		door = self.active_block.GetDoorAt((x,y))
+		if door is None or door.open_state: return False
+		
+		# found door, open it
+		self.active_block.SetDoorState(door, True)
+		return True
+		
+		
+	# try to move the player one cell in the given direction
+	def MovePlayer(self, x_dist, y_dist):
+		
+		(x,y) = self.player.location
+		
+		# if player is not yet facing this direction, rotate them
+		if self.player.facing != (x_dist, y_dist):
+			self.player.facing = (x_dist, y_dist)
+		
+		# make sure new location would still be on map
+		if x+x_dist < 0 or x+x_dist >= MAP_WIDTH:
+			return False
+		if y+y_dist < 0 or y+y_dist >= MAP_HEIGHT:
+			return False
+		
+		# check for entity blocking
+		for entity in self.active_block.GetEntitiesAt((x+x_dist,y+y_dist)):
+			if entity.is_door:
+				if not entity.open_state: return False
+			if entity.is_human: return False
+		
+		# check for wall blocking
+		if self.active_block.char_map[x+x_dist,y+y_dist] == CELL_WALL: return False
+		
+		# check for leaving the play area
+		if self.active_block.char_map[x+x_dist,y+y_dist] == CELL_NULL: return False
+		
+		# move the player
+		self.player.location = (x+x_dist, y+y_dist)
+		
+		return True
+	
+	
+	# move the player up to max_moves cells in the given direction with an AI turn
+	# after each move, stopping early when something interesting happens: the player
+	# is seen, reaches stairs or a link, or comes next to a new door or human. View
+	# maps are left for the caller to update once at the end; step_callback is
+	# called after each move if given, eg. to draw frames. Returns the number of
+	# cells moved
+	def RunPlayer(self, x_dist, y_dist, max_moves, step_callback=None):
+		
+		moves = 0
+		nearby = self.GetNearbyEntities()
+		while moves < max_moves:
+			if not self.DoAction(ACTION_MOVE, x_dist, y_dist): break
+			moves += 1
+			player_seen = self.DoAction(ACTION_AI_TURN)
+			if step_callback is not None:
+				step_callback()
+			
+			if player_seen: break
+			if self.active_block.char_map[self.player.location] in [CELL_STAIRS, CELL_LINK]:
+				break
+			new_nearby = self.GetNearbyEntities()
+			if not new_nearby <= nearby: break
+			nearby = new_nearby
+		
+		return moves
+	
+	
+	# get the doors and humans in the cells around the player
+	def GetNearbyEntities(self):
+		(x, y) = self.player.location
+		nearby = set()
+		for xm in [-1, 0, 1]:
+			for ym in [-1, 0, 1]:
+				for entity in self.active_block.GetEntitiesAt((x+xm, y+ym)):
+					if entity.is_door or (entity.is_human and not entity.is_player):
+						nearby.add(entity)
+		return nearby
+	
+	
+	# try to warp the player to an adjacent block
+	def LinkPlayer(self):
+		
+		for (xm, ym) in BLOCK_LINKS:
+			if self.active_block.link_locations[(xm, ym)] is not None:
+				(x, y) = self.active_block.link_locations[(xm, ym)]
+				
+				# player is on a link location
+				if self.player.location == (x, y):
+					
+					# move them to the adjacent block and move view
+					self.player.block = self.active_block.links[(xm, ym)]
+					self.SetActiveBlock(self.player.block)
+					
+					# place them at the corresponding link location in the new block
+					self.player.location = self.active_block.link_locations[(0-xm, 0-ym)]
+					
+					return True
+		
+		return False
+	
+	
+	# player is trying to go up or down stairs
+	def PlayerTakesStairs(self, upward):
+		
+		# make sure player is on a stair tile
+		if self.active_block.char_map[self.player.location] != CELL_STAIRS: return
+		
+		# see if there is a link here
+		if upward:
+			fm = -1
+		else:
+			fm = 1
+		
+		# no vertical link there
+		if self.player.block.vertical_links[fm] is None: return False
+		
+		# move up/down
+		self.player.block = self.player.block.vertical_links[fm]
+		self.SetActiveBlock(self.player.block)
+		
+		return True
+
+
+
+##### General Functions ######
+
+# create a new map grid holding one value per cell, indexed as [x,y]
+def NewGrid(fill, dtype=np.uint8):
+	return np.full((MAP_WIDTH, MAP_HEIGHT), fill, dtype=dtype, order='F')
+
+
+# returns True if the given cell is within the map grid
+def OnMap(x, y):
+	return 0 <= x < MAP_WIDTH and 0 <= y < MAP_HEIGHT
+
+
+# build the ray stencil for a light of the given radius and facing: the
+# offsets of each step along each ray in order, one row per ray, and the light
+# level at each step along a ray
+def BuildRayStencil(radius, facing):
+	
+	STEP = 2			# how many steps per cycle
+	
+	# if light has a facing, only cast it for 90 degrees in that direction
+	if facing is None:
+		cast_start = 0
+		cast_end = 361
+	else:
+		if facing == (0,-1):
+			cast_start = 135
+			cast_end = 225
+		elif facing == (-1,0):
+			cast_start = 225
+			cast_end = 315
+		elif facing == (0,1):
+			cast_start = 315
+			cast_end = 45
+		elif facing == (1,0):
+			cast_start = 45
+			cast_end = 135
+		else:
+			return None
+	
+	angles = []
+	for i in range(0, 361, STEP):
+		if facing is not None:
+			if facing == (0,1):
+				if i < cast_start and i > cast_end: continue
+			else:
+				if i < cast_start and i < cast_end: continue
+				if i > cast_start and i > cast_end: continue
+		angles.append(i)
+	
+	# step each ray along its angle, using the precalculated sin and cos values
+	steps = np.ones((len(angles), radius))
+	rx = np.cumsum(steps * np.array([SINTABLE[i] for i in angles])[:,np.newaxis], axis=1)
+	ry = np.cumsum(steps * np.array([COSTABLE[i] for i in angles])[:,np.newaxis], axis=1)
+	
+	levels = np.array([255 - int(255 * z * 0.07) for z in range(radius)])
+	return (rx, ry, levels)
+
+
+# get the ray stencil for the given radius and facing, building it the first
+# time it is needed
+def GetRayStencil(radius, facing):
+	key = (radius, facing)
+	if key not in RAY_STENCILS:
+		RAY_STENCILS[key] = BuildRayStencil(radius, facing)
+	return RAY_STENCILS[key]
+
+
+# cast light from a point into light_map, stopping at walls and blocking cells;
+# all rays are cast at once using the stencil for this radius and facing
+def Raycast(light_map, char_map, blocking_map, x, y, radius, facing=None):
+	
+	stencil = GetRayStencil(radius, facing)
+	if stencil is None:
+		print('ERROR: Incorrect facing on entity')
+		return
+	(dx, dy, levels) = stencil
+	
+	# truncate rather than floor, so rays behave the same at the map edges
+	cx = (dx + x).astype(int)
+	cy = (dy + y).astype(int)
+	on_map = (cx >= 0) & (cx < MAP_WIDTH) & (cy >= 0) & (cy < MAP_HEIGHT)
+	cx = np.clip(cx, 0, MAP_WIDTH-1)
+	cy = np.clip(cy, 0, MAP_HEIGHT-1)
+	cells = char_map[cx, cy]
+	lit = levels > 0
+	
+	# a ray stops before a cell that is off the map or in unplayable area, and
+	# after a lit cell holding a wall or a blocking entity (eg. closed door)
+	stop_before = ~on_map | (cells == CELL_NULL)
+	stop_after = ((cells == CELL_WALL) | blocking_map[cx, cy]) & lit
+	stop_before[:,1:] |= stop_after[:,:-1]
+	reached = np.logical_and.accumulate(~stop_before, axis=1) & lit
+	
+	# add light, keeping the brightest level for each cell
+	np.maximum.at(light_map, (cx[reached], cy[reached]),
+		np.broadcast_to(levels, reached.shape)[reached].astype(light_map.dtype))
+
+
+# cast field of view from a point with iterative shadowcasting, based on:
+# http://www.roguebasin.com/index.php?title=Python_shadowcasting_implementation
+# opaque holds the opacity of each cell in column order; returns a grid of the
+# cells that can be seen
+def ShadowCast(opaque, x, y):
+	
+	# Multipliers for transforming coordinates to other octants:
+	MULT = [
+		[1,  0,  0, -1, -1,  0,  0,  1],
+		[0,  1, -1,  0,  0, -1,  1,  0],
+		[0,  1,  1,  0,  0, -1, -1,  0],
+		[1,  0,  0,  1, -1,  0,  0, -1]
+	]
+	
+	vis = bytearray(MAP_WIDTH * MAP_HEIGHT)
+	
+	for octant in range(8):
+		(xx, xy, yx, yy) = (MULT[0][octant], MULT[1][octant],
+			MULT[2][octant], MULT[3][octant])
+		
+		# rows past the edge of the map in this octant can't be seen
+		if xy == 1: last_row = x
+		elif xy == -1: last_row = MAP_WIDTH-1-x
+		elif yy == 1: last_row = y
+		else: last_row = MAP_HEIGHT-1-y
+		
+		# each entry is a row to scan and the slopes bounding the scan
+		stack = [(1, 1.0, 0.0)]
+		while len(stack) > 0:
+			(row, start, end) = stack.pop()
+			if start < end: continue
+			
+			for j in range(row, last_row+1):
+				dx, dy = -j-1, -j
+				blocked = False
+				while dx <= 0:
+					dx += 1
+					
+					# translate the dx, dy coordinates into map coordinates
+					mx, my = x + dx * xx + dy * xy, y + dx * yx + dy * yy
+					
+					# l_slope and r_slope store the slopes of the left and right
+					# extremities of the square we're considering
+					l_slope, r_slope = (dx-0.5)/(dy+0.5), (dx+0.5)/(dy-0.5)
+					
+					if start < r_slope:
+						continue
+					elif end > l_slope:
+						break
+					
+					# ray is touching this square, set it as visible
+					if 0 <= mx < MAP_WIDTH and 0 <= my < MAP_HEIGHT:
+						i = mx + my * MAP_WIDTH
+						vis[i] = 1
+						cell_blocked = opaque[i]
+					else:
+						cell_blocked = True
+					
+					if blocked:
+						
+						# we're scanning a row of blocked squares
+						if cell_blocked:
+							new_start = r_slope
+							continue
+						else:
+							blocked = False
+							start = new_start
+					
+					elif cell_blocked and j < last_row:
+						
+						# scan the rows past this blocked square later
+						blocked = True
+						stack.append((j+1, start, l_slope))
+						new_start = r_slope
+				
+				# Row is scanned; do next row unless last square was blocked
+				if blocked:
+					break
+	
+	return np.frombuffer(vis, dtype=bool).reshape((MAP_WIDTH, MAP_HEIGHT), order='F')
+
+
+# pack a map grid of booleans into a bitset, in column order
+def PackGrid(grid):
+	return np.packbits(grid.ravel(order='F'))
+
+
+# unpack a bitset made by PackGrid into a map grid
+def UnpackGrid(packed):
+	bits = np.unpackbits(packed, count=MAP_WIDTH*MAP_HEIGHT).view(bool)
+	return bits.reshape((MAP_WIDTH, MAP_HEIGHT), order='F')
+
+
+# returns True if the given cell is set in a bitset made by PackGrid
+def PackedGridCell(packed, x, y):
+	i = x + y * MAP_WIDTH
+	return bool(packed[i >> 3] & (0x80 >> (i & 7)))
+
+
+# start a new game from the given seed; for a known seed, the fully generated world
+# is kept in the world cache and loaded from there the next time
+def NewGame(seed=None, workers=None):
+	
+	# random new world, nothing to gain from caching it
+	if seed is None:
+		return Game(workers=workers)
+	
+	key = sha256((str(GENERATOR_VERSION) + ':' + str(seed)).encode()).hexdigest()
+	filename = os.path.join(WORLD_CACHE_DIR, key + '.world')
+	if os.path.exists(filename):
+		with open(filename, 'rb') as f:
+			return pickle.load(f)
+	
+	game = Game(seed=seed, workers=workers)
+	game.GenerateAll()
+	
+	os.makedirs(WORLD_CACHE_DIR, exist_ok=True)
+	WriteFile(filename, pickle.dumps(game, pickle.HIGHEST_PROTOCOL))
+	return game
+
+
+# generate a block layout in a worker process and send it back
+def GenerateLayout(layout):
+	layout.Generate()
+	return layout
+
+
+# get the distance between two points
+def GetDistanceBetween(x1, y1, x2, y2):
+	return sqrt(abs(x1-x2)**2 + abs(y1-y2)**2)
+
+
+# save the given game in progress; only the changes since the last save are added
+# to the save log, with a full save to start with, whenever something changed that
+# can only be saved in full, and every so often to keep the log short; saves are
+# encoded here and handed to a background thread to write to disk. With
+# SAVE_JOURNAL, the actions taken since the last save are logged instead
+def SaveGame(game):
+	
+	global save_writer
+	if save_writer is None:
+		save_writer = SaveWriter()
+	
+	changes = game.GetChanges()
+	actions = game.journal
+	game.journal = []
+	
+	if SAVE_JOURNAL:
+		full_save = game.saved_changes is None or game.saved_changes >= JOURNAL_CHECKPOINT_INTERVAL
+	else:
+		full_save = (changes is None or game.saved_changes is None or
+			game.saved_changes >= SAVE_SNAPSHOT_INTERVAL)
+	
+	if full_save or game.journal_saves != SAVE_JOURNAL:
+		game.journal_saves = SAVE_JOURNAL
+		game.saved_changes = 0
+		
+		# a new random id for every full save, so that a log left over from an
+		# earlier save, even of another game, is never replayed onto this one
+		save_id = game.save_id
+		while save_id == game.save_id:
+			save_id = randint(1, 2**32-1)
+		game.save_id = save_id
+		save_writer.AddFullSave(EncodeSave(game))
+		
+		# actions are only replayed onto the full save they follow
+		if SAVE_JOURNAL:
+			save_writer.AddChanges(EncodeAction(ACTION_CHECKPOINT, game.save_id))
+		return
+	
+	if SAVE_JOURNAL:
+		if len(actions) > 0:
+			save_writer.AddChanges(b''.join(actions))
+			game.saved_changes += len(actions)
+		return
+	
+	# changes are only replayed onto the full save they follow
+	changes['save_id'] = game.save_id
+	save_writer.AddChanges(pickle.dumps(changes, pickle.HIGHEST_PROTOCOL))
+	game.saved_changes += 1
+
+
+# wait until every save handed to the background thread has been written
+def FlushSaves():
+	if save_writer is None: return
+	save_writer.Flush()
+
+
+# encode a full save of the given game: a header, the state of the game itself,
+# then one section for each generated block-floor. Floors that were never
+# generated are rebuilt from the seed instead
+def EncodeSave(game):
+	
+	floors = []
+	sections = []
+	offset = 0
+	for ((x, y), blocks) in sorted(game.block_map.items()):
+		for block in blocks:
+			if block.generated:
+				section = block.SaveSection()
+			elif block.saved_section is not None:
+				# copy it out, so the save it came from can be replaced
+				section = bytes(block.saved_section)
+				block.saved_section = section
+			else:
+				continue
+			floors.append((x, y, block.floor, offset, len(section)))
+			sections.append(section)
+			offset += len(section)
+	
+	state = pickle.dumps({
+		'save_id': game.save_id,
+		'journal': game.journal_saves,
+		'game': game.GetState(),
+		'floors': floors
+	}, pickle.HIGHEST_PROTOCOL)
+	header = SAVE_HEADER.pack(b'RGSV', SAVE_FORMAT_VERSION, GENERATOR_VERSION, game.seed,
+		len(state))
+	return b''.join([header, state] + sections)
+
+
+# decode a full save from EncodeSave, returns None if it is not one that this
+# version can load; the world is rebuilt from its seed, and each saved block-floor
+# is only decoded when it is generated, starting with the one the player is on
+def DecodeSave(data):
+	
+	if len(data) < SAVE_HEADER.size: return None
+	(marker, format_version, generator_version, seed, state_size) = SAVE_HEADER.unpack_from(data)
+	if (marker != b'RGSV' or format_version != SAVE_FORMAT_VERSION or
+			generator_version != GENERATOR_VERSION):
+		return None
+	offset = SAVE_HEADER.size
+	state = pickle.loads(data[offset:offset+state_size])
+	offset += state_size
+	
+	game = Game(seed=seed, restoring=True)
+	game.save_id = state['save_id']
+	game.journal_saves = state['journal']
+	
+	view = memoryview(data)
+	for (x, y, floor, start, size) in state['floors']:
+		block = game.block_map[(x,y)][floor]
+		block.saved_section = view[offset+start:offset+start+size]
+	
+	game.ApplyChanges(state['game'])
+	game.saved_changes = 0
+	return game
+
+
+# load and return a saved game, replaying the changes logged since its full save;
+# returns None if there is no save that can be loaded
+def LoadGame():
+	FlushSaves()
+	
+	if not os.path.exists(SAVE_FILE): return None
+	with open(SAVE_FILE, 'rb') as f:
+		data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+	game = DecodeSave(data)
+	if game is None:
+		print('ERROR: Saved game is from an incompatible version')
+		return None
+	
+	if os.path.exists(SAVE_LOG_FILE):
+		with open(SAVE_LOG_FILE, 'rb') as f:
+			if game.journal_saves:
+				ReplayJournal(game, f.read())
+			else:
+				ReplayChanges(game, f)
+	
+	# the replayed changes are already saved
+	game.GetChanges()
+	game.journal = []
+	
+	# view maps for where the player is now
+	game.UpdateViewMaps()
+	return game
+
+
+# apply the changes logged since the full save to the given game
+def ReplayChanges(game, f):
+	while True:
+		try:
+			changes = pickle.load(f)
+		except EOFError:
+			break
+		
+		# the last change was cut short, so start again with a full save
+		except pickle.UnpicklingError:
+			game.saved_changes = None
+			break
+		
+		# left over from before the full save
+		if changes['save_id'] != game.save_id:
+			game.saved_changes = None
+			break
+		
+		game.ApplyChanges(changes)
+		if game.saved_changes is not None:
+			game.saved_changes += 1
+
+
+# take the actions journalled since the full save again in the given game
+def ReplayJournal(game, data):
+	checkpoint = False
+	try:
+		for (action, args) in ReadJournal(data):
+			
+			# actions left over from before the full save
+			if action == ACTION_CHECKPOINT:
+				checkpoint = args[0] == game.save_id
+				if not checkpoint: break
+				continue
+			if not checkpoint: break
+			
+			game.RunAction(action, args)
+			game.saved_changes += 1
+	
+	# the last action was cut short, so start again with a full save
+	except ValueError:
+		game.saved_changes = None
+		return
+	
+	if not checkpoint and len(data) > 0:
+		game.saved_changes = None
+
+
+# encode one action for the save journal: its action code, then its arguments
+def EncodeAction(action, *args):
+	if action == ACTION_MESSAGE:
+		text = args[0].encode()
+		return bytes([action]) + ACTION_RECORDS[action].pack(len(text)) + text
+	return bytes([action]) + ACTION_RECORDS[action].pack(*args)
+
+
+# read the actions from a save journal, as pairs of action code and arguments;
+# raises ValueError if an action is cut short
+def ReadJournal(data):
+	offset = 0
+	while offset < len(data):
+		action = data[offset]
+		record = ACTION_RECORDS.get(action)
+		if record is None or offset+1+record.size > len(data):
+			raise ValueError('Journal action cut short')
+		args = record.unpack_from(data, offset+1)
+		offset += 1 + record.size
+		
+		if action == ACTION_MESSAGE:
+			text = data[offset:offset+args[0]]
+			if len(text) < args[0]:
+				raise ValueError('Journal action cut short')
+			args = (text.decode(),)
+			offset += len(text)
+		
+		yield (action, args)
+
+
+# write data to a file and make sure it is on disk; the file is replaced in one
+# step, so an interrupted write is never loaded
+def WriteFile(filename, data):
+	with open(filename + '.tmp', 'wb') as f:
+		f.write(data)
+		f.flush()
+		os.fsync(f.fileno())
+	os.replace(filename + '.tmp', filename)
+
+
+
+##### Save Writer - writes saves to disk in a background thread #####
+class SaveWriter:
+	def __init__(self):
+		self.condition = threading.Condition()
+		self.full_save = None			# full save waiting to be written
+		self.changes = []			# changes waiting to be written, after any full save
+		self.writing = False			# thread is writing saves right now
+		
+		self.thread = threading.Thread(target=self.Run, daemon=True)
+		self.thread.start()
+	
+	
+	# hand over an encoded full save; anything still waiting is replaced by it
+	def AddFullSave(self, data):
+		with self.condition:
+			self.full_save = data
+			self.changes = []
+			self.condition.notify_all()
+	
+	
+	# hand over pickled changes, to be added to the save log
+	def AddChanges(self, data):
+		with self.condition:
+			self.changes.append(data)
+			self.condition.notify_all()
+	
+	
+	# wait until everything handed over has been written
+	def Flush(self):
+		with self.condition:
+			while self.writing or self.full_save is not None or len(self.changes) > 0:
+				self.condition.wait()
+	
+	
+	# write saves as they are handed over; everything waiting is written together,
+	# so saves that arrive faster than the disk can keep up are coalesced
+	def Run(self):
+		while True:
+			with self.condition:
+				while self.full_save is None and len(self.changes) == 0:
+					self.condition.wait()
+				(full_save, changes) = (self.full_save, self.changes)
+				self.full_save = None
+				self.changes = []
+				self.writing = True
+			
+			try:
+				if full_save is not None:
+					WriteFile(SAVE_FILE, full_save)
+					WriteFile(SAVE_LOG_FILE, b''.join(changes))
+				else:
+					with open(SAVE_LOG_FILE, 'ab') as f:
+						f.write(b''.join(changes))
+						f.flush()
+						os.fsync(f.fileno())
+			except OSError as e:
+				print('ERROR: Could not write save: ' + str(e))
+			
+			with self.condition:
+				self.writing = False
+				self.condition.notify_all()
+
+
+save_writer = None		# started with the first save
+
+# make sure the last saves are written when the program exits
+atexit.register(FlushSaves)
+
+
+##### Headless Benchmark #####
+
+# run this module directly to generate a complex and time player turns without
+# opening a window, eg. for profiling; pass a seed to get the same world every run
+if __name__ == '__main__':
+	
+	import sys
+	from time import perf_counter
+	
+	seed = None
+	if len(sys.argv) > 1:
+		seed = int(sys.argv[1])
+	
+	start = perf_counter()
+	game = NewGame(seed)
+	game.UpdateViewMaps()
+	print('Generated complex in ' + str(round(perf_counter()-start, 4)) + 's')
+	
+	start = perf_counter()
+	turns = 0
+	for i in range(50):
+		for (xm, ym) in BLOCK_LINKS:
+			game.MovePlayer(xm, ym)
+			game.UpdateViewMaps()
+			game.DoAITurn()
+			turns += 1
+	print('Ran ' + str(turns) + ' turns in ' + str(round(perf_counter()-start, 4)) + 's')